@@ -6,7 +6,7 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_wtf.csrf import CSRFProtect
-from config import config
+from config import get_config, DEV_SECRET_KEY
 import logging
 from logging.handlers import RotatingFileHandler
 import os
@@ -17,6 +17,14 @@ login_manager = LoginManager()
 csrf = CSRFProtect()
 mongo_db = None  # Will be initialized in create_app
 
+# Static security headers added to every response
+SECURITY_HEADERS = (
+    ('X-Content-Type-Options', 'nosniff'),
+    ('X-Frame-Options', 'SAMEORIGIN'),
+    ('X-XSS-Protection', '1; mode=block'),
+    ('Strict-Transport-Security', 'max-age=31536000; includeSubDomains'),
+)
+
 
 def create_app(config_name='development'):
     """
@@ -32,7 +40,9 @@ def create_app(config_name='development'):
     app = Flask(__name__)
     
     # Load configuration
-    app.config.from_object(config[config_name])
+    app.config.from_object(get_config(config_name))
+    if not app.config.get('SECRET_KEY'):
+        raise RuntimeError('SECRET_KEY must be set in the environment')
     
     # Initialize Flask extensions
     db.init_app(app)
@@ -57,30 +67,32 @@ def create_app(config_name='development'):
     @login_manager.user_loader
     def load_user(user_id):
         from app.models.user import User
-        return User.query.get(int(user_id))
+        return db.session.get(User, int(user_id))
     
     # Register blueprints
-    from app.routes import auth_bp, patient_bp, main_bp
-    app.register_blueprint(auth_bp)
-    app.register_blueprint(patient_bp)
-    app.register_blueprint(main_bp)
+    _register_blueprints(app)
     
     # Configure logging
     configure_logging(app)
+    if app.config['SECRET_KEY'] == DEV_SECRET_KEY and not app.testing:
+        app.logger.warning('SECRET_KEY is not set; using the development key')
+    
+    # Write security events from a background thread
+    if app.config.get('ASYNC_SECURITY_LOG', True):
+        from app.utils.security import enable_buffered_security_log
+        enable_buffered_security_log()
     
     # Create database tables
-    with app.app_context():
-        db.create_all()
-        app.logger.info('Database tables created')
+    if app.config.get('CREATE_TABLES_ON_STARTUP', True):
+        with app.app_context():
+            db.create_all()
+            app.logger.info('Database tables created')
     
     # Security headers
     @app.after_request
     def set_security_headers(response):
         """Add security headers to all responses"""
-        response.headers['X-Content-Type-Options'] = 'nosniff'
-        response.headers['X-Frame-Options'] = 'SAMEORIGIN'
-        response.headers['X-XSS-Protection'] = '1; mode=block'
-        response.headers['Strict-Transport-Security'] = 'max-age=31536000; includeSubDomains'
+        response.headers.update(SECURITY_HEADERS)
         return response
     
     # Error handlers
@@ -106,6 +118,19 @@ def create_app(config_name='development'):
     return app
 
 
+def _register_blueprints(app):
+    """
+    Import and register the blueprints listed in the BLUEPRINTS setting
+    app.routes imports a blueprint's module only when it is looked up
+    
+    Args:
+        app (Flask): Flask application instance
+    """
+    from app import routes
+    for blueprint_name in app.config['BLUEPRINTS']:
+        app.register_blueprint(getattr(routes, blueprint_name))
+
+
 def configure_logging(app):
     """
     Configure application logging without exposing sensitive data
@@ -2,15 +2,96 @@
 Patient data management module for MongoDB operations
 Implements CRUD operations for stroke prediction patient records
 """
-from pymongo import MongoClient, ASCENDING
-from pymongo.errors import PyMongoError, DuplicateKeyError
+import bson
+import pymongo
+from pymongo import MongoClient, ASCENDING, TEXT
+from pymongo.errors import PyMongoError, DuplicateKeyError, BulkWriteError, OperationFailure
+from bson.codec_options import CodecOptions, TypeDecoder, TypeRegistry
 from bson.objectid import ObjectId
 from datetime import datetime
 import logging
+import threading
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Connection pool and wire settings shared by every client
+CLIENT_OPTIONS = {
+    'maxPoolSize': 50,
+    'minPoolSize': 5,
+    'waitQueueTimeoutMS': 2000,
+    'serverSelectionTimeoutMS': 3000,
+    'retryWrites': True,
+    'compressors': 'zlib'
+}
+
+class ObjectIdAsStr(TypeDecoder):
+    """Decode ObjectId values to strings so records are template-ready"""
+    bson_type = ObjectId
+    
+    def transform_bson(self, value):
+        return str(value)
+
+
+# Codec options for the patients collection
+PATIENT_CODEC_OPTIONS = CodecOptions(type_registry=TypeRegistry([ObjectIdAsStr()]))
+
+# Documents fetched per cursor round trip when streaming results
+CURSOR_BATCH_SIZE = 50
+
+# Unique patient_id index, and the auto-named sparse index it replaces
+PATIENT_ID_INDEX = 'patient_id_unique'
+LEGACY_PATIENT_ID_INDEX = 'patient_id_1'
+
+# Shared MongoClient per connection URI with the number of holders using it
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(uri):
+    """
+    Return the shared MongoClient for a URI, creating it on first use
+    Each call must be paired with release_client(uri)
+    
+    Args:
+        uri (str): MongoDB connection URI
+        
+    Returns:
+        MongoClient: Pooled client for the URI
+    """
+    with _clients_lock:
+        entry = _clients.get(uri)
+        if entry is None:
+            entry = _clients[uri] = [MongoClient(uri, **CLIENT_OPTIONS), 0]
+        entry[1] += 1
+        return entry[0]
+
+
+def release_client(uri):
+    """
+    Release one holder of the shared client, closing it after the last one
+    
+    Args:
+        uri (str): MongoDB connection URI
+        
+    Returns:
+        bool: True if the client was closed, False if others still use it
+    """
+    with _clients_lock:
+        entry = _clients.get(uri)
+        if entry is None:
+            return False
+        entry[1] -= 1
+        if entry[1] > 0:
+            return False
+        del _clients[uri]
+    entry[0].close()
+    return True
+
+
+class DuplicatePatientError(Exception):
+    """Raised when a patient record with the same patient ID already exists"""
+
 
 class PatientDatabase:
     """
@@ -26,25 +107,79 @@ class PatientDatabase:
             uri (str): MongoDB connection URI
             db_name (str): Database name
         """
+        self.uri = uri
+        self.client = None
         try:
-            self.client = MongoClient(uri)
+            self.client = get_client(uri)
             self.db = self.client[db_name]
-            self.collection = self.db['patients']
+            self.collection = self.db.get_collection('patients', codec_options=PATIENT_CODEC_OPTIONS)
             self._create_indexes()
+            if not (pymongo.has_c() and bson.has_c()):
+                logger.warning("PyMongo C extensions unavailable; BSON will be decoded in pure Python")
             logger.info("MongoDB connection established successfully")
         except PyMongoError as e:
             logger.error(f"Failed to connect to MongoDB: {str(e)}")
+            self.close()
             raise
     
     def _create_indexes(self):
         """Create indexes for better query performance"""
         try:
-            # Create index on patient_id for faster lookups
-            self.collection.create_index([('patient_id', ASCENDING)], unique=True, sparse=True)
+            # Unique patient_id index; the legacy sparse one is only dropped
+            # once this exists, so uniqueness is enforced throughout (servers
+            # refusing two indexes on one key pattern keep the legacy one)
+            if self._create_index(
+                [('patient_id', ASCENDING)],
+                name=PATIENT_ID_INDEX,
+                unique=True,
+                partialFilterExpression={'patient_id': {'$exists': True}}
+            ):
+                self._drop_index(LEGACY_PATIENT_ID_INDEX)
+            
+            # Text index backing free-text patient search; language 'none'
+            # disables stemming and stop words ('Other' is an English one)
+            self._create_index(
+                [('gender', TEXT), ('work_type', TEXT), ('smoking_status', TEXT)],
+                name='patient_text_idx',
+                default_language='none'
+            )
             logger.info("MongoDB indexes created successfully")
         except PyMongoError as e:
             logger.warning(f"Index creation warning: {str(e)}")
     
+    def _create_index(self, keys, **options):
+        """
+        Create one index, logging a server-side rejection instead of raising
+        An options conflict on one index must not skip the others
+        
+        Args:
+            keys (list): Index key specification as (field, direction) pairs
+            **options: Options passed to create_index
+            
+        Returns:
+            bool: True if the index was created or already exists
+        """
+        try:
+            self.collection.create_index(keys, **options)
+            return True
+        except OperationFailure as e:
+            logger.warning(f"Index creation warning for {keys}: {str(e)}")
+            return False
+    
+    def _drop_index(self, name):
+        """
+        Drop an index by name if it exists
+        
+        Args:
+            name (str): Index name
+        """
+        try:
+            if name in self.collection.index_information():
+                self.collection.drop_index(name)
+                logger.info(f"Dropped index {name}")
+        except OperationFailure as e:
+            logger.warning(f"Could not drop index {name}: {str(e)}")
+    
     def create_patient(self, patient_data):
         """
         Create a new patient record
@@ -54,6 +189,9 @@ class PatientDatabase:
             
         Returns:
             str: Inserted document ID or None if failed
+            
+        Raises:
+            DuplicatePatientError: If the patient ID is already taken
         """
         try:
             # Add timestamp
@@ -65,11 +203,45 @@ class PatientDatabase:
             return str(result.inserted_id)
         except DuplicateKeyError:
             logger.error("Patient ID already exists")
-            return None
+            raise DuplicatePatientError(patient_data.get('patient_id'))
         except PyMongoError as e:
             logger.error(f"Error creating patient record: {str(e)}")
             return None
     
+    def bulk_create(self, docs, ordered=False):
+        """
+        Create many patient records in batched round trips
+        
+        Args:
+            docs (list): Patient documents to insert
+            ordered (bool): Stop at the first failed insert if True
+            
+        Returns:
+            int: Number of records inserted
+        """
+        if not docs:
+            return 0
+        
+        try:
+            # Share one timestamp across the batch
+            now = datetime.utcnow()
+            for doc in docs:
+                doc.setdefault('created_at', now)
+                doc.setdefault('updated_at', now)
+            
+            result = self.collection.insert_many(
+                docs, ordered=ordered, bypass_document_validation=False
+            )
+            logger.info(f"Bulk created {len(result.inserted_ids)} patient records")
+            return len(result.inserted_ids)
+        except BulkWriteError as e:
+            inserted = e.details.get('nInserted', 0)
+            logger.error(f"Bulk insert partially failed: {inserted} of {len(docs)} records inserted")
+            return inserted
+        except PyMongoError as e:
+            logger.error(f"Error bulk creating patient records: {str(e)}")
+            return 0
+    
     def get_patient_by_id(self, patient_id):
         """
         Retrieve a patient record by MongoDB ObjectId
@@ -81,33 +253,45 @@ class PatientDatabase:
             dict: Patient record or None if not found
         """
         try:
-            patient = self.collection.find_one({'_id': ObjectId(patient_id)})
-            if patient:
-                patient['_id'] = str(patient['_id'])
-            return patient
+            return self.collection.find_one({'_id': ObjectId(patient_id)})
         except Exception as e:
             logger.error(f"Error retrieving patient: {str(e)}")
             return None
     
-    def get_all_patients(self, skip=0, limit=100):
+    def get_all_patients(self, after_id=None, limit=100, projection=None):
         """
-        Retrieve all patient records with pagination
+        Retrieve all patient records with keyset pagination (newest first)
         
         Args:
-            skip (int): Number of records to skip
+            after_id (str): Document ID of the last record on the previous page
             limit (int): Maximum number of records to return
+            projection (dict): Fields to return (all fields if None)
             
         Returns:
             list: List of patient records
         """
+        return list(self.iter_all_patients(after_id, limit, projection))
+    
+    def iter_all_patients(self, after_id=None, limit=100, projection=None):
+        """
+        Stream patient records with keyset pagination (newest first)
+        
+        Args:
+            after_id (str): Document ID of the last record on the previous page
+            limit (int): Maximum number of records to return
+            projection (dict): Fields to return (all fields if None)
+            
+        Yields:
+            dict: Patient records as they arrive from the cursor
+        """
         try:
-            patients = list(self.collection.find().skip(skip).limit(limit).sort('created_at', -1))
-            for patient in patients:
-                patient['_id'] = str(patient['_id'])
-            return patients
+            query = {}
+            if after_id and ObjectId.is_valid(after_id):
+                query['_id'] = {'$lt': ObjectId(after_id)}
+            cursor = self.collection.find(query, projection).sort('_id', -1).limit(limit)
+            yield from cursor.batch_size(CURSOR_BATCH_SIZE)
         except PyMongoError as e:
             logger.error(f"Error retrieving patients: {str(e)}")
-            return []
     
     def update_patient(self, patient_id, update_data):
         """
@@ -157,24 +341,39 @@ class PatientDatabase:
             logger.error(f"Error deleting patient: {str(e)}")
             return False
     
-    def search_patients(self, query):
+    def search_patients(self, query, projection=None, sort=None):
         """
         Search patients by various fields
         
         Args:
             query (dict): Search criteria
+            projection (dict): Fields to return (all fields if None)
+            sort (list): Sort specification as (key, direction) pairs
             
         Returns:
             list: Matching patient records
         """
+        return list(self.iter_search_patients(query, projection, sort))
+    
+    def iter_search_patients(self, query, projection=None, sort=None):
+        """
+        Stream patients matching the search criteria
+        
+        Args:
+            query (dict): Search criteria
+            projection (dict): Fields to return (all fields if None)
+            sort (list): Sort specification as (key, direction) pairs
+            
+        Yields:
+            dict: Matching patient records as they arrive from the cursor
+        """
         try:
-            patients = list(self.collection.find(query))
-            for patient in patients:
-                patient['_id'] = str(patient['_id'])
-            return patients
+            cursor = self.collection.find(query, projection)
+            if sort:
+                cursor = cursor.sort(sort)
+            yield from cursor.batch_size(CURSOR_BATCH_SIZE)
         except PyMongoError as e:
             logger.error(f"Error searching patients: {str(e)}")
-            return []
     
     def get_patient_count(self):
         """
@@ -189,7 +388,23 @@ class PatientDatabase:
             logger.error(f"Error counting patients: {str(e)}")
             return 0
     
+    def get_estimated_count(self):
+        """
+        Get approximate number of patient records from collection metadata
+        
+        Returns:
+            int: Estimated count of patients
+        """
+        try:
+            return self.collection.estimated_document_count()
+        except PyMongoError as e:
+            logger.error(f"Error estimating patient count: {str(e)}")
+            return 0
+    
     def close(self):
-        """Close MongoDB connection"""
-        self.client.close()
-        logger.info("MongoDB connection closed")
+        """Release this handler's share of the MongoDB connection"""
+        if self.client is None:
+            return
+        self.client = None
+        if release_client(self.uri):
+            logger.info("MongoDB connection closed")
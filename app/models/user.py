@@ -3,10 +3,38 @@ User model for authentication system
 Implements secure user authentication with password hashing
 Uses SQLite database via SQLAlchemy ORM
 """
+from flask import current_app
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm.attributes import set_committed_value
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 from app import db
+import bcrypt
+import logging
+
+logger = logging.getLogger(__name__)
+
+# bcrypt ignores every byte of the password after the 72nd
+BCRYPT_MAX_PASSWORD_BYTES = 72
+
+# Single background writer so login responses do not wait on the commit
+_login_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='last-login')
+
+
+@lru_cache(maxsize=1)
+def _argon2_hasher():
+    """
+    Build the Argon2id hasher (requires the optional argon2-cffi package)
+    
+    Returns:
+        argon2.PasswordHasher: Hasher with the configured cost parameters
+    """
+    from argon2 import PasswordHasher
+    return PasswordHasher(time_cost=2, memory_cost=19456, parallelism=1)
 
 
 class User(UserMixin, db.Model):
@@ -35,12 +63,25 @@ class User(UserMixin, db.Model):
     
     def set_password(self, password):
         """
-        Hash and store password securely using Werkzeug's password hashing
+        Hash and store password securely using the configured PASSWORD_HASH_METHOD
         
         Args:
             password (str): Plain text password to hash
+            
+        Raises:
+            ValueError: If bcrypt is selected and the password exceeds its 72-byte limit
         """
-        self.password_hash = generate_password_hash(password, method='pbkdf2:sha256')
+        method = current_app.config.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256')
+        if method == 'argon2id':
+            self.password_hash = _argon2_hasher().hash(password)
+        elif method == 'bcrypt':
+            if len(password.encode('utf-8')) > BCRYPT_MAX_PASSWORD_BYTES:
+                raise ValueError(f'bcrypt passwords are limited to {BCRYPT_MAX_PASSWORD_BYTES} bytes')
+            rounds = current_app.config.get('BCRYPT_LOG_ROUNDS', 12)
+            salt = bcrypt.gensalt(rounds=rounds)
+            self.password_hash = bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+        else:
+            self.password_hash = generate_password_hash(password, method=method)
     
     def check_password(self, password):
         """
@@ -52,12 +93,31 @@ class User(UserMixin, db.Model):
         Returns:
             bool: True if password matches, False otherwise
         """
+        if self.password_hash.startswith('$argon2'):
+            from argon2.exceptions import VerificationError, InvalidHashError
+            try:
+                return _argon2_hasher().verify(self.password_hash, password)
+            except (VerificationError, InvalidHashError):
+                return False
+        if self.password_hash.startswith('$2'):
+            return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
         return check_password_hash(self.password_hash, password)
     
     def update_last_login(self):
-        """Update the last login timestamp"""
-        self.last_login = datetime.utcnow()
-        db.session.commit()
+        """
+        Update the last login timestamp
+        The write is handed to a background thread unless ASYNC_LAST_LOGIN is disabled
+        """
+        timestamp = datetime.utcnow()
+        if current_app.config.get('ASYNC_LAST_LOGIN', True):
+            # Show the new value on this instance without marking it dirty,
+            # so the request's session never writes it a second time
+            set_committed_value(self, 'last_login', timestamp)
+            app = current_app._get_current_object()
+            _login_writer.submit(_write_last_login, app, self.id, timestamp)
+        else:
+            self.last_login = timestamp
+            db.session.commit()
     
     def to_dict(self):
         """
@@ -74,3 +134,23 @@ class User(UserMixin, db.Model):
             'last_login': self.last_login.isoformat() if self.last_login else None,
             'is_active': self.is_active
         }
+
+
+def _write_last_login(app, user_id, timestamp):
+    """
+    Persist a login timestamp in its own session
+    
+    Args:
+        app (Flask): Application whose database should be updated
+        user_id (int): ID of the user who logged in
+        timestamp (datetime): Login time
+    """
+    with app.app_context():
+        try:
+            db.session.execute(
+                update(User).where(User.id == user_id).values(last_login=timestamp)
+            )
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            logger.error(f"Error updating last login: {str(e)}")
@@ -1,8 +1,22 @@
 """
 Routes package initialization
+Blueprints are imported lazily so create_app only loads the ones it registers
 """
-from .auth import auth_bp
-from .patient import patient_bp
-from .main import main_bp
+import importlib
 
-__all__ = ['auth_bp', 'patient_bp', 'main_bp']
+# Registry of available blueprints and the modules that define them;
+# the BLUEPRINTS setting chooses which of these create_app registers
+_BLUEPRINT_MODULES = {
+    'auth_bp': 'app.routes.auth',
+    'patient_bp': 'app.routes.patient',
+    'main_bp': 'app.routes.main',
+}
+
+__all__ = list(_BLUEPRINT_MODULES)
+
+
+def __getattr__(name):
+    """Import a blueprint module on first access to its blueprint"""
+    if name in _BLUEPRINT_MODULES:
+        return getattr(importlib.import_module(_BLUEPRINT_MODULES[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -4,9 +4,10 @@ Handles user registration, login, and logout with security measures
 """
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, login_required, current_user
+from sqlalchemy import select, bindparam
 from app import db
 from app.models.user import User
-from app.utils.validators import LoginForm, RegistrationForm
+from app.utils.validators import LoginForm, RegistrationForm, get_display_form
 from app.utils.security import log_security_event
 import logging
 
@@ -16,6 +17,9 @@ logger = logging.getLogger(__name__)
 # Create Blueprint
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
 
+# Login lookup built once; SQLAlchemy caches its compiled form
+_LOGIN_STMT = select(User).where(User.username == bindparam('username'))
+
 
 @auth_bp.route('/register', methods=['GET', 'POST'])
 def register():
@@ -27,6 +31,9 @@ def register():
     if current_user.is_authenticated:
         return redirect(url_for('main.dashboard'))
     
+    if request.method == 'GET':
+        return render_template('auth/register.html', form=get_display_form(RegistrationForm), title='Register')
+    
     form = RegistrationForm()
     
     if form.validate_on_submit():
@@ -68,11 +75,16 @@ def login():
     if current_user.is_authenticated:
         return redirect(url_for('main.dashboard'))
     
+    if request.method == 'GET':
+        return render_template('auth/login.html', form=get_display_form(LoginForm), title='Login')
+    
     form = LoginForm()
     
     if form.validate_on_submit():
         # Find user by username
-        user = User.query.filter_by(username=form.username.data.strip()).first()
+        user = db.session.execute(
+            _LOGIN_STMT, {'username': form.username.data.strip()}
+        ).scalar_one_or_none()
         
         # Verify credentials
         if user and user.check_password(form.password.data):
@@ -4,11 +4,13 @@ Handles CRUD operations for patient records with security
 """
 from flask import Blueprint, render_template, redirect, url_for, flash, request, abort
 from flask_login import login_required, current_user
-from app.utils.validators import PatientForm
+from app.utils.validators import PatientForm, get_display_form
 from app.utils.validators import UpdatePatientForm
 from app.utils.security import log_security_event, sanitize_input
+from app.models.patient import DuplicatePatientError
 from app import mongo_db
 import logging
+import time
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -16,30 +18,101 @@ logger = logging.getLogger(__name__)
 # Create Blueprint
 patient_bp = Blueprint('patient', __name__, url_prefix='/patients')
 
+# Seconds the estimated patient count is reused across list requests
+COUNT_CACHE_TTL = 10
+
+# Process-local cache of the estimated patient count
+_count_cache = {'value': 0, 'expires': 0.0}
+
+# Fields rendered by the patient list template
+LIST_PROJECTION = {
+    'patient_id': 1,
+    'gender': 1,
+    'age': 1,
+    'hypertension': 1,
+    'heart_disease': 1,
+    'stroke': 1,
+    'created_at': 1
+}
+
+# Converters applied to submitted form fields when building patient documents
+PATIENT_FIELD_CASTERS = {
+    'gender': sanitize_input,
+    'age': float,
+    'hypertension': int,
+    'heart_disease': int,
+    'ever_married': sanitize_input,
+    'work_type': sanitize_input,
+    'residence_type': sanitize_input,
+    'avg_glucose_level': float,
+    'bmi': float,
+    'smoking_status': sanitize_input,
+    'stroke': int
+}
+
+# New records also carry the (immutable) dataset patient ID
+NEW_PATIENT_FIELD_CASTERS = {'patient_id': int, **PATIENT_FIELD_CASTERS}
+
+
+def _cached_patient_count():
+    """
+    Get the estimated patient count, refreshing it at most every COUNT_CACHE_TTL seconds
+    
+    Returns:
+        int: Estimated count of patients
+    """
+    now = time.monotonic()
+    if now >= _count_cache['expires']:
+        _count_cache['value'] = mongo_db.get_estimated_count()
+        _count_cache['expires'] = now + COUNT_CACHE_TTL
+    return _count_cache['value']
+
+
+def _invalidate_patient_count():
+    """Force the next list request to re-read the patient count"""
+    _count_cache['expires'] = 0.0
+
+
+def _form_to_document(form, casters):
+    """
+    Convert validated form data into a patient document
+    
+    Args:
+        form (FlaskForm): Validated patient form
+        casters (dict): Field name to converter mapping
+        
+    Returns:
+        dict: Patient fields, with None for empty optional fields
+    """
+    fields = {name: getattr(form, name).data for name in casters}
+    return {
+        name: (cast(fields[name]) if fields[name] is not None else None)
+        for name, cast in casters.items()
+    }
+
 
 @patient_bp.route('/')
 @login_required
 def list_patients():
     """
     Display list of all patients
-    Implements pagination for better performance
+    Implements cursor-based pagination for better performance
     """
     try:
-        # Get pagination parameters
-        page = request.args.get('page', 1, type=int)
+        # Get pagination cursor (last document ID of the previous page)
+        after = request.args.get('after')
         per_page = 20
-        skip = (page - 1) * per_page
         
-        # Retrieve patients from MongoDB
-        patients = mongo_db.get_all_patients(skip=skip, limit=per_page)
-        total_count = mongo_db.get_patient_count()
-        total_pages = (total_count + per_page - 1) // per_page
+        # Stream patients from MongoDB; the template tracks the next cursor
+        # and uses the one extra record only to detect a following page
+        patients = mongo_db.iter_all_patients(after_id=after, limit=per_page + 1, projection=LIST_PROJECTION)
+        total_count = _cached_patient_count()
         
         return render_template(
             'patients/list.html',
             patients=patients,
-            page=page,
-            total_pages=total_pages,
+            after=after,
+            per_page=per_page,
             total_count=total_count,
             title='Patient List'
         )
@@ -56,37 +129,22 @@ def add_patient():
     Add new patient record
     Validates input and prevents duplicate patient IDs
     """
+    if request.method == 'GET':
+        return render_template('patients/add.html', form=get_display_form(PatientForm), title='Add Patient')
+    
     form = PatientForm()
     
     if form.validate_on_submit():
         try:
             # Prepare patient data
-            patient_data = {
-                'patient_id': int(form.patient_id.data),
-                'gender': sanitize_input(form.gender.data),
-                'age': float(form.age.data),
-                'hypertension': int(form.hypertension.data),
-                'heart_disease': int(form.heart_disease.data),
-                'ever_married': sanitize_input(form.ever_married.data),
-                'work_type': sanitize_input(form.work_type.data),
-                'residence_type': sanitize_input(form.residence_type.data),
-                'avg_glucose_level': float(form.avg_glucose_level.data),
-                'bmi': float(form.bmi.data) if form.bmi.data else None,
-                'smoking_status': sanitize_input(form.smoking_status.data),
-                'stroke': int(form.stroke.data),
-                'created_by': current_user.id
-            }
-            
-            # Check if patient ID already exists
-            existing = mongo_db.search_patients({'patient_id': patient_data['patient_id']})
-            if existing:
-                flash(f"Patient ID {patient_data['patient_id']} already exists.", 'warning')
-                return render_template('patients/add.html', form=form, title='Add Patient')
+            patient_data = _form_to_document(form, NEW_PATIENT_FIELD_CASTERS)
+            patient_data['created_by'] = current_user.id
             
-            # Insert patient record
+            # Insert patient record; the unique index rejects duplicate IDs
             patient_id = mongo_db.create_patient(patient_data)
             
             if patient_id:
+                _invalidate_patient_count()
                 log_security_event('PATIENT_CREATED', user_id=current_user.id, 
                                  details=f"Patient ID: {patient_data['patient_id']}")
                 flash('Patient record added successfully!', 'success')
@@ -95,6 +153,8 @@ def add_patient():
             else:
                 flash('Failed to add patient record. Please try again.', 'danger')
                 
+        except DuplicatePatientError:
+            flash(f"Patient ID {patient_data['patient_id']} already exists.", 'warning')
         except ValueError as e:
             flash('Invalid input data. Please check your entries.', 'danger')
             logger.error(f"Validation error in add_patient: {str(e)}")
@@ -144,20 +204,8 @@ def edit_patient(patient_id):
         
         if form.validate_on_submit():
             # Prepare update data
-            update_data = {
-                'gender': sanitize_input(form.gender.data),
-                'age': float(form.age.data),
-                'hypertension': int(form.hypertension.data),
-                'heart_disease': int(form.heart_disease.data),
-                'ever_married': sanitize_input(form.ever_married.data),
-                'work_type': sanitize_input(form.work_type.data),
-                'residence_type': sanitize_input(form.residence_type.data),
-                'avg_glucose_level': float(form.avg_glucose_level.data),
-                'bmi': float(form.bmi.data) if form.bmi.data else None,
-                'smoking_status': sanitize_input(form.smoking_status.data),
-                'stroke': int(form.stroke.data),
-                'updated_by': current_user.id
-            }
+            update_data = _form_to_document(form, PATIENT_FIELD_CASTERS)
+            update_data['updated_by'] = current_user.id
             
             # Update patient record
             success = mongo_db.update_patient(patient_id, update_data)
@@ -211,6 +259,7 @@ def delete_patient(patient_id):
             success = mongo_db.delete_patient(patient_id)
             
             if success:
+                _invalidate_patient_count()
                 log_security_event('PATIENT_DELETED', user_id=current_user.id, 
                                  details=f"Patient MongoDB ID: {patient_id}")
                 flash('Patient record deleted successfully.', 'success')
@@ -235,6 +284,8 @@ def search_patients():
     """
     try:
         query = {}
+        projection = None
+        sort = None
         search_term = request.args.get('q', '').strip()
         
         if search_term:
@@ -242,16 +293,12 @@ def search_patients():
             if search_term.isdigit():
                 query['patient_id'] = int(search_term)
             else:
-                # Search by gender, work_type, etc.
-                query = {
-                    '$or': [
-                        {'gender': {'$regex': search_term, '$options': 'i'}},
-                        {'work_type': {'$regex': search_term, '$options': 'i'}},
-                        {'smoking_status': {'$regex': search_term, '$options': 'i'}}
-                    ]
-                }
+                # Search by gender, work_type, etc. via the text index
+                query = {'$text': {'$search': search_term}}
+                projection = {'score': {'$meta': 'textScore'}}
+                sort = [('score', {'$meta': 'textScore'})]
         
-        patients = mongo_db.search_patients(query) if query else []
+        patients = mongo_db.search_patients(query, projection, sort) if query else []
         
         return render_template(
             'patients/search.html',
@@ -2,12 +2,40 @@
 Security utilities module
 Implements additional security helper functions
 """
-import re
 from flask import request
+from collections import deque
+import atexit
+import functools
 import logging
+import os
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
+# Length-preserving ASCII lowercasing, so offsets found in the lowered
+# copy are valid in the original string (str.lower can change lengths)
+_ASCII_LOWER = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')
+
+# Blocklist of passwords rejected regardless of complexity, one per line
+COMMON_PASSWORDS_FILE = os.path.join(os.path.dirname(__file__), 'common_passwords.txt')
+# Mirrors the shipped file, so an unreadable file never weakens the policy
+_FALLBACK_COMMON_PASSWORDS = frozenset({'password', '12345678', 'qwerty', 'abc123'})
+
+# Pending security event messages; deque append/popleft are thread-safe
+_event_buffer = deque(maxlen=10000)
+_buffer_lock = threading.Lock()  # keeps the overflow count exact
+_dropped_events = 0
+
+# Buffering is switched on per app; the writer thread is per process
+_async_enabled = False
+_flusher = None
+_flusher_lock = threading.Lock()
+
+# Background flush cadence and maximum events written per flush
+FLUSH_INTERVAL = 0.2
+FLUSH_BATCH_SIZE = 500
+
 
 def sanitize_input(input_string):
     """
@@ -25,13 +53,53 @@ def sanitize_input(input_string):
     # Remove potentially dangerous characters
     sanitized = input_string.strip()
     
+    # Common case: no markup at all, so skip lowercasing and both patterns
+    if sanitized.find('<') == -1:
+        return sanitized
+    
     # Remove script tags and other potentially harmful HTML
-    sanitized = re.sub(r'<script[^>]*>.*?</script>', '', sanitized, flags=re.IGNORECASE | re.DOTALL)
-    sanitized = re.sub(r'<iframe[^>]*>.*?</iframe>', '', sanitized, flags=re.IGNORECASE | re.DOTALL)
+    sanitized = _strip_element(sanitized, 'script')
+    sanitized = _strip_element(sanitized, 'iframe')
     
     return sanitized
 
 
+def _strip_element(text, tag):
+    """
+    Remove every <tag ...>...</tag> element, matching tags case-insensitively
+    Equivalent to re.sub(r'<tag[^>]*>.*?</tag>', '', text, flags=I|S) but
+    linear: once an opening tag has no later '>' or closing tag, no later
+    opening tag can have one either, so the scan stops instead of retrying
+    
+    Args:
+        text (str): Text to clean
+        tag (str): Lowercase element name
+        
+    Returns:
+        str: Text with the matching elements removed
+    """
+    lower = text.translate(_ASCII_LOWER)
+    opening, closing = f'<{tag}', f'</{tag}>'
+    start = lower.find(opening)
+    if start == -1:
+        return text
+    
+    parts = []
+    pos = 0
+    while start != -1:
+        tag_end = lower.find('>', start + len(opening))
+        if tag_end == -1:
+            break
+        end = lower.find(closing, tag_end + 1)
+        if end == -1:
+            break
+        parts.append(text[pos:start])
+        pos = end + len(closing)
+        start = lower.find(opening, pos)
+    parts.append(text[pos:])
+    return ''.join(parts)
+
+
 def log_security_event(event_type, user_id=None, details=None):
     """
     Log security-related events without exposing sensitive data
@@ -41,15 +109,123 @@ def log_security_event(event_type, user_id=None, details=None):
         user_id (int): User ID (if applicable)
         details (str): Additional non-sensitive details
     """
+    # Skip building the message when warnings are filtered out
+    if not logger.isEnabledFor(logging.WARNING):
+        return
+    
     ip_address = request.remote_addr if request else 'Unknown'
     
-    log_message = f"Security Event: {event_type} | IP: {ip_address}"
+    parts = [f"Security Event: {event_type}", f"IP: {ip_address}"]
     if user_id:
-        log_message += f" | User ID: {user_id}"
+        parts.append(f"User ID: {user_id}")
     if details:
-        log_message += f" | Details: {details}"
+        parts.append(f"Details: {details}")
+    log_message = " | ".join(parts)
+    
+    # Write immediately unless buffered logging is enabled
+    if not _async_enabled:
+        logger.warning(log_message)
+        return
     
-    logger.warning(log_message)
+    if _flusher is None:
+        _start_flusher()
+    _buffer_event(log_message)
+
+
+def _buffer_event(message):
+    """
+    Queue a security event message, counting any event the full buffer evicts
+    
+    Args:
+        message (str): Formatted event message
+    """
+    global _dropped_events
+    with _buffer_lock:
+        if len(_event_buffer) == _event_buffer.maxlen:
+            _dropped_events += 1
+        _event_buffer.append(message)
+
+
+def flush_security_events(limit=None):
+    """
+    Write buffered security events to the log
+    
+    Args:
+        limit (int): Maximum number of events to write (all if None)
+    """
+    global _dropped_events
+    if _dropped_events:
+        with _buffer_lock:
+            dropped, _dropped_events = _dropped_events, 0
+        logger.error(f"Security event buffer full: {dropped} older events were dropped")
+    
+    count = len(_event_buffer) if limit is None else min(limit, len(_event_buffer))
+    for _ in range(count):
+        try:
+            logger.warning(_event_buffer.popleft())
+        except IndexError:
+            break
+
+
+def _flush_loop():
+    """Periodically drain the security event buffer"""
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        flush_security_events(FLUSH_BATCH_SIZE)
+
+
+def enable_buffered_security_log():
+    """
+    Enable buffered security logging
+    The writer thread is started lazily by the first event in each process
+    """
+    global _async_enabled
+    if _async_enabled:
+        return
+    _async_enabled = True
+    atexit.register(flush_security_events)
+
+
+def _start_flusher():
+    """Start this process's background thread that writes buffered events"""
+    global _flusher
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, name='security-log-flusher', daemon=True)
+            _flusher.start()
+
+
+def _reset_after_fork():
+    """
+    Forget the parent's writer thread and buffer in a forked child
+    Threads do not survive fork, so the child starts its own on demand
+    """
+    global _flusher, _flusher_lock, _buffer_lock, _dropped_events
+    _flusher = None
+    _flusher_lock = threading.Lock()
+    _buffer_lock = threading.Lock()
+    _event_buffer.clear()  # the parent still writes these itself
+    _dropped_events = 0
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+@functools.lru_cache(maxsize=1)
+def _common_passwords():
+    """
+    Load the common password blocklist once, on first use
+    
+    Returns:
+        frozenset: Lowercased blocked passwords
+    """
+    try:
+        with open(COMMON_PASSWORDS_FILE, 'r', encoding='utf-8') as f:
+            return frozenset(line.strip().lower() for line in f if line.strip())
+    except OSError as e:
+        logger.warning(f"Could not read password blocklist: {e}")
+        return _FALLBACK_COMMON_PASSWORDS
 
 
 def validate_password_strength(password):
@@ -65,18 +241,29 @@ def validate_password_strength(password):
     if len(password) < 8:
         return False, "Password must be at least 8 characters long"
     
-    if not re.search(r'[A-Z]', password):
+    # Single pass over the password, stopping once every class is seen
+    has_upper = has_lower = has_digit = False
+    for ch in password:
+        if 'A' <= ch <= 'Z':
+            has_upper = True
+        elif 'a' <= ch <= 'z':
+            has_lower = True
+        elif ch.isdecimal():
+            has_digit = True
+        if has_upper and has_lower and has_digit:
+            break
+    
+    if not has_upper:
         return False, "Password must contain at least one uppercase letter"
     
-    if not re.search(r'[a-z]', password):
+    if not has_lower:
         return False, "Password must contain at least one lowercase letter"
     
-    if not re.search(r'\d', password):
+    if not has_digit:
         return False, "Password must contain at least one digit"
     
     # Check for common weak passwords
-    common_passwords = ['password', '12345678', 'qwerty', 'abc123']
-    if password.lower() in common_passwords:
+    if password.lower() in _common_passwords():
         return False, "Password is too common. Please choose a stronger password"
     
     return True, "Password is strong"
@@ -89,6 +276,9 @@ def get_client_ip():
     Returns:
         str: Client IP address
     """
-    if request.environ.get('HTTP_X_FORWARDED_FOR'):
-        return request.environ['HTTP_X_FORWARDED_FOR'].split(',')[0]
-    return request.environ.get('REMOTE_ADDR', 'Unknown')
+    env = request.environ
+    forwarded_for = env.get('HTTP_X_FORWARDED_FOR')
+    if forwarded_for:
+        # Only the first (client) entry matters; stop at the first comma
+        return forwarded_for.split(',', 1)[0].strip()
+    return env.get('REMOTE_ADDR', 'Unknown')
@@ -2,13 +2,63 @@
 Form validation module using Flask-WTF and WTForms
 Implements secure input validation and CSRF protection
 """
+import re
+from flask import current_app
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SubmitField, SelectField, FloatField, IntegerField
 from wtforms.validators import (
     DataRequired, Email, EqualTo, Length, ValidationError,
     NumberRange, Optional, Regexp
 )
-from app.models.user import User
+from app.models.user import User, BCRYPT_MAX_PASSWORD_BYTES
+from app.utils.security import validate_password_strength
+
+# Empty, CSRF-less form instances shared by GET requests that only render them
+_display_forms = {}
+
+
+def get_display_form(form_class):
+    """
+    Return a shared, unbound instance of a form for rendering GET requests
+    Templates emit the CSRF token themselves when form.meta.csrf is off
+    
+    Args:
+        form_class (type): FlaskForm subclass to instantiate
+        
+    Returns:
+        FlaskForm: Cached form instance with no submitted data
+    """
+    form = _display_forms.get(form_class)
+    if form is None:
+        form = form_class(formdata=None, meta={'csrf': False})
+        _display_forms[form_class] = form
+    return form
+
+
+# Stateless validator instances shared across form fields
+_USERNAME_REQUIRED = DataRequired(message='Username is required')
+_PASSWORD_REQUIRED = DataRequired(message='Password is required')
+_EMAIL_REQUIRED = DataRequired(message='Email is required')
+_CONFIRM_PASSWORD_REQUIRED = DataRequired(message='Please confirm your password')
+_PATIENT_ID_REQUIRED = DataRequired(message='Patient ID is required')
+_PATIENT_ID_RANGE = NumberRange(min=1, max=999999, message='Invalid Patient ID')
+_AGE_REQUIRED = DataRequired(message='Age is required')
+_AGE_RANGE = NumberRange(min=0, max=120, message='Age must be between 0 and 120')
+_GLUCOSE_REQUIRED = DataRequired(message='Average glucose level is required')
+_GLUCOSE_RANGE = NumberRange(min=0, max=500, message='Glucose level must be between 0 and 500')
+_BMI_OPTIONAL = Optional()
+_BMI_RANGE = NumberRange(min=10, max=100, message='BMI must be between 10 and 100')
+_GENDER_REQUIRED = DataRequired(message='Gender is required')
+_HYPERTENSION_REQUIRED = DataRequired(message='Hypertension status is required')
+_HEART_DISEASE_REQUIRED = DataRequired(message='Heart disease status is required')
+_EVER_MARRIED_REQUIRED = DataRequired(message='Marital status is required')
+_WORK_TYPE_REQUIRED = DataRequired(message='Work type is required')
+_RESIDENCE_TYPE_REQUIRED = DataRequired(message='Residence type is required')
+_SMOKING_STATUS_REQUIRED = DataRequired(message='Smoking status is required')
+_STROKE_REQUIRED = DataRequired(message='Stroke status is required')
+
+# \Z rather than $ so a trailing newline cannot slip through
+_USERNAME_RE = re.compile(r'^[A-Za-z0-9_]+\Z')
 
 
 class RegistrationForm(FlaskForm):
@@ -19,9 +69,9 @@ class RegistrationForm(FlaskForm):
     username = StringField(
         'Username',
         validators=[
-            DataRequired(message='Username is required'),
+            _USERNAME_REQUIRED,
             Length(min=3, max=80, message='Username must be between 3 and 80 characters'),
-            Regexp('^[A-Za-z0-9_]+$', message='Username must contain only letters, numbers, and underscores')
+            Regexp(_USERNAME_RE, message='Username must contain only letters, numbers, and underscores')
         ],
         render_kw={'placeholder': 'Enter username', 'class': 'form-control'}
     )
@@ -29,7 +79,7 @@ class RegistrationForm(FlaskForm):
     email = StringField(
         'Email',
         validators=[
-            DataRequired(message='Email is required'),
+            _EMAIL_REQUIRED,
             Email(message='Invalid email address'),
             Length(max=120, message='Email must be less than 120 characters')
         ],
@@ -39,12 +89,8 @@ class RegistrationForm(FlaskForm):
     password = PasswordField(
         'Password',
         validators=[
-            DataRequired(message='Password is required'),
-            Length(min=8, max=128, message='Password must be between 8 and 128 characters'),
-            Regexp(
-                r'^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)',
-                message='Password must contain at least one uppercase letter, one lowercase letter, and one digit'
-            )
+            _PASSWORD_REQUIRED,
+            Length(min=8, max=128, message='Password must be between 8 and 128 characters')
         ],
         render_kw={'placeholder': 'Enter password', 'class': 'form-control'}
     )
@@ -52,7 +98,7 @@ class RegistrationForm(FlaskForm):
     confirm_password = PasswordField(
         'Confirm Password',
         validators=[
-            DataRequired(message='Please confirm your password'),
+            _CONFIRM_PASSWORD_REQUIRED,
             EqualTo('password', message='Passwords must match')
         ],
         render_kw={'placeholder': 'Confirm password', 'class': 'form-control'}
@@ -60,17 +106,46 @@ class RegistrationForm(FlaskForm):
     
     submit = SubmitField('Register', render_kw={'class': 'btn btn-primary btn-block'})
     
+    def _load_conflicts(self):
+        """
+        Look up existing users matching the submitted username or email
+        Runs a single query per form and caches the result for both validators
+        
+        Returns:
+            dict: Whether the 'username' and 'email' values are already taken
+        """
+        if getattr(self, '_conflicts', None) is None:
+            username, email = self.username.data, self.email.data
+            rows = User.query.with_entities(User.username, User.email).filter(
+                (User.username == username) | (User.email == email)
+            ).all()
+            self._conflicts = {
+                'username': any(row.username == username for row in rows),
+                'email': any(row.email == email for row in rows)
+            }
+        return self._conflicts
+    
     def validate_username(self, username):
         """Check if username already exists"""
-        user = User.query.filter_by(username=username.data).first()
-        if user:
+        if self._load_conflicts()['username']:
             raise ValidationError('Username already taken. Please choose a different one.')
     
     def validate_email(self, email):
         """Check if email already exists"""
-        user = User.query.filter_by(email=email.data).first()
-        if user:
+        if self._load_conflicts()['email']:
             raise ValidationError('Email already registered. Please use a different one.')
+    
+    def validate_password(self, password):
+        """Apply the shared password strength policy in a single pass"""
+        # The Length validator has already reported a bad length
+        if password.errors:
+            return
+        if (current_app.config.get('PASSWORD_HASH_METHOD') == 'bcrypt'
+                and len(password.data.encode('utf-8')) > BCRYPT_MAX_PASSWORD_BYTES):
+            raise ValidationError(f'Password must be at most {BCRYPT_MAX_PASSWORD_BYTES} bytes long')
+        is_valid, message = validate_password_strength(password.data or '')
+        if not is_valid:
+            raise ValidationError(message)
 
 
 class LoginForm(FlaskForm):
@@ -80,7 +155,7 @@ class LoginForm(FlaskForm):
     username = StringField(
         'Username',
         validators=[
-            DataRequired(message='Username is required'),
+            _USERNAME_REQUIRED,
             Length(min=3, max=80, message='Invalid username')
         ],
         render_kw={'placeholder': 'Enter username', 'class': 'form-control'}
@@ -89,7 +164,7 @@ class LoginForm(FlaskForm):
     password = PasswordField(
         'Password',
         validators=[
-            DataRequired(message='Password is required')
+            _PASSWORD_REQUIRED
         ],
         render_kw={'placeholder': 'Enter password', 'class': 'form-control'}
     )
@@ -97,228 +172,130 @@ class LoginForm(FlaskForm):
     submit = SubmitField('Login', render_kw={'class': 'btn btn-primary btn-block'})
 
 
-class PatientForm(FlaskForm):
+# Choice tuples shared by the patient forms, built once at import
+_GENDER_CHOICES = (('', 'Select Gender'), ('Male', 'Male'), ('Female', 'Female'), ('Other', 'Other'))
+_BOOL_CHOICES = (('', 'Select'), ('0', 'No'), ('1', 'Yes'))
+_YES_NO_CHOICES = (('', 'Select'), ('Yes', 'Yes'), ('No', 'No'))
+_WORK_TYPE_CHOICES = (
+    ('', 'Select Work Type'),
+    ('Private', 'Private'),
+    ('Self-employed', 'Self-employed'),
+    ('Govt_job', 'Government Job'),
+    ('children', 'Children'),
+    ('Never_worked', 'Never Worked')
+)
+_RESIDENCE_CHOICES = (('', 'Select'), ('Urban', 'Urban'), ('Rural', 'Rural'))
+_SMOKING_CHOICES = (
+    ('', 'Select Smoking Status'),
+    ('formerly smoked', 'Formerly Smoked'),
+    ('never smoked', 'Never Smoked'),
+    ('smokes', 'Smokes'),
+    ('Unknown', 'Unknown')
+)
+
+
+class _PatientFieldsMixin:
     """
-    Patient data form with comprehensive validation
+    Clinical fields shared by the create and update patient forms
     Based on Stroke Prediction Dataset schema
     """
-    # Patient identification
-    patient_id = IntegerField(
-        'Patient ID',
-        validators=[
-            DataRequired(message='Patient ID is required'),
-            NumberRange(min=1, max=999999, message='Invalid Patient ID')
-        ],
-        render_kw={'placeholder': 'Enter patient ID', 'class': 'form-control'}
-    )
-    
     # Demographics
     gender = SelectField(
         'Gender',
-        choices=[('', 'Select Gender'), ('Male', 'Male'), ('Female', 'Female'), ('Other', 'Other')],
-        validators=[DataRequired(message='Gender is required')],
+        choices=_GENDER_CHOICES,
+        validators=[_GENDER_REQUIRED],
         render_kw={'class': 'form-control'}
     )
     
     age = FloatField(
         'Age',
-        validators=[
-            DataRequired(message='Age is required'),
-            NumberRange(min=0, max=120, message='Age must be between 0 and 120')
-        ],
+        validators=[_AGE_REQUIRED, _AGE_RANGE],
         render_kw={'placeholder': 'Enter age', 'class': 'form-control'}
     )
     
     # Medical history
     hypertension = SelectField(
         'Hypertension',
-        choices=[('', 'Select'), ('0', 'No'), ('1', 'Yes')],
-        validators=[DataRequired(message='Hypertension status is required')],
+        choices=_BOOL_CHOICES,
+        validators=[_HYPERTENSION_REQUIRED],
         render_kw={'class': 'form-control'}
     )
     
     heart_disease = SelectField(
         'Heart Disease',
-        choices=[('', 'Select'), ('0', 'No'), ('1', 'Yes')],
-        validators=[DataRequired(message='Heart disease status is required')],
+        choices=_BOOL_CHOICES,
+        validators=[_HEART_DISEASE_REQUIRED],
         render_kw={'class': 'form-control'}
     )
     
     ever_married = SelectField(
         'Ever Married',
-        choices=[('', 'Select'), ('Yes', 'Yes'), ('No', 'No')],
-        validators=[DataRequired(message='Marital status is required')],
+        choices=_YES_NO_CHOICES,
+        validators=[_EVER_MARRIED_REQUIRED],
         render_kw={'class': 'form-control'}
     )
     
     # Lifestyle and occupation
     work_type = SelectField(
         'Work Type',
-        choices=[
-            ('', 'Select Work Type'),
-            ('Private', 'Private'),
-            ('Self-employed', 'Self-employed'),
-            ('Govt_job', 'Government Job'),
-            ('children', 'Children'),
-            ('Never_worked', 'Never Worked')
-        ],
-        validators=[DataRequired(message='Work type is required')],
+        choices=_WORK_TYPE_CHOICES,
+        validators=[_WORK_TYPE_REQUIRED],
         render_kw={'class': 'form-control'}
     )
     
     residence_type = SelectField(
         'Residence Type',
-        choices=[('', 'Select'), ('Urban', 'Urban'), ('Rural', 'Rural')],
-        validators=[DataRequired(message='Residence type is required')],
+        choices=_RESIDENCE_CHOICES,
+        validators=[_RESIDENCE_TYPE_REQUIRED],
         render_kw={'class': 'form-control'}
     )
     
     # Health metrics
     avg_glucose_level = FloatField(
         'Average Glucose Level',
-        validators=[
-            DataRequired(message='Average glucose level is required'),
-            NumberRange(min=0, max=500, message='Glucose level must be between 0 and 500')
-        ],
+        validators=[_GLUCOSE_REQUIRED, _GLUCOSE_RANGE],
         render_kw={'placeholder': 'Enter glucose level (mg/dL)', 'class': 'form-control'}
     )
     
     bmi = FloatField(
         'BMI',
-        validators=[
-            Optional(),
-            NumberRange(min=10, max=100, message='BMI must be between 10 and 100')
-        ],
+        validators=[_BMI_OPTIONAL, _BMI_RANGE],
         render_kw={'placeholder': 'Enter BMI (optional)', 'class': 'form-control'}
     )
     
     smoking_status = SelectField(
         'Smoking Status',
-        choices=[
-            ('', 'Select Smoking Status'),
-            ('formerly smoked', 'Formerly Smoked'),
-            ('never smoked', 'Never Smoked'),
-            ('smokes', 'Smokes'),
-            ('Unknown', 'Unknown')
-        ],
-        validators=[DataRequired(message='Smoking status is required')],
+        choices=_SMOKING_CHOICES,
+        validators=[_SMOKING_STATUS_REQUIRED],
         render_kw={'class': 'form-control'}
     )
     
     # Outcome
     stroke = SelectField(
         'Stroke',
-        choices=[('', 'Select'), ('0', 'No'), ('1', 'Yes')],
-        validators=[DataRequired(message='Stroke status is required')],
+        choices=_BOOL_CHOICES,
+        validators=[_STROKE_REQUIRED],
         render_kw={'class': 'form-control'}
     )
+
+
+class PatientForm(_PatientFieldsMixin, FlaskForm):
+    """
+    Patient data form with comprehensive validation
+    Based on Stroke Prediction Dataset schema
+    """
+    # Patient identification
+    patient_id = IntegerField(
+        'Patient ID',
+        validators=[_PATIENT_ID_REQUIRED, _PATIENT_ID_RANGE],
+        render_kw={'placeholder': 'Enter patient ID', 'class': 'form-control'}
+    )
     
     submit = SubmitField('Submit', render_kw={'class': 'btn btn-success'})
 
 
-class UpdatePatientForm(FlaskForm):
+class UpdatePatientForm(_PatientFieldsMixin, FlaskForm):
     """
     Patient update form (without patient_id as it's not editable)
     """
-    # Demographics
-    gender = SelectField(
-        'Gender',
-        choices=[('', 'Select Gender'), ('Male', 'Male'), ('Female', 'Female'), ('Other', 'Other')],
-        validators=[DataRequired(message='Gender is required')],
-        render_kw={'class': 'form-control'}
-    )
-    
-    age = FloatField(
-        'Age',
-        validators=[
-            DataRequired(message='Age is required'),
-            NumberRange(min=0, max=120, message='Age must be between 0 and 120')
-        ],
-        render_kw={'placeholder': 'Enter age', 'class': 'form-control'}
-    )
-    
-    # Medical history
-    hypertension = SelectField(
-        'Hypertension',
-        choices=[('', 'Select'), ('0', 'No'), ('1', 'Yes')],
-        validators=[DataRequired(message='Hypertension status is required')],
-        render_kw={'class': 'form-control'}
-    )
-    
-    heart_disease = SelectField(
-        'Heart Disease',
-        choices=[('', 'Select'), ('0', 'No'), ('1', 'Yes')],
-        validators=[DataRequired(message='Heart disease status is required')],
-        render_kw={'class': 'form-control'}
-    )
-    
-    ever_married = SelectField(
-        'Ever Married',
-        choices=[('', 'Select'), ('Yes', 'Yes'), ('No', 'No')],
-        validators=[DataRequired(message='Marital status is required')],
-        render_kw={'class': 'form-control'}
-    )
-    
-    # Lifestyle and occupation
-    work_type = SelectField(
-        'Work Type',
-        choices=[
-            ('', 'Select Work Type'),
-            ('Private', 'Private'),
-            ('Self-employed', 'Self-employed'),
-            ('Govt_job', 'Government Job'),
-            ('children', 'Children'),
-            ('Never_worked', 'Never Worked')
-        ],
-        validators=[DataRequired(message='Work type is required')],
-        render_kw={'class': 'form-control'}
-    )
-    
-    residence_type = SelectField(
-        'Residence Type',
-        choices=[('', 'Select'), ('Urban', 'Urban'), ('Rural', 'Rural')],
-        validators=[DataRequired(message='Residence type is required')],
-        render_kw={'class': 'form-control'}
-    )
-    
-    # Health metrics
-    avg_glucose_level = FloatField(
-        'Average Glucose Level',
-        validators=[
-            DataRequired(message='Average glucose level is required'),
-            NumberRange(min=0, max=500, message='Glucose level must be between 0 and 500')
-        ],
-        render_kw={'placeholder': 'Enter glucose level (mg/dL)', 'class': 'form-control'}
-    )
-    
-    bmi = FloatField(
-        'BMI',
-        validators=[
-            Optional(),
-            NumberRange(min=10, max=100, message='BMI must be between 10 and 100')
-        ],
-        render_kw={'placeholder': 'Enter BMI (optional)', 'class': 'form-control'}
-    )
-    
-    smoking_status = SelectField(
-        'Smoking Status',
-        choices=[
-            ('', 'Select Smoking Status'),
-            ('formerly smoked', 'Formerly Smoked'),
-            ('never smoked', 'Never Smoked'),
-            ('smokes', 'Smokes'),
-            ('Unknown', 'Unknown')
-        ],
-        validators=[DataRequired(message='Smoking status is required')],
-        render_kw={'class': 'form-control'}
-    )
-    
-    # Outcome
-    stroke = SelectField(
-        'Stroke',
-        choices=[('', 'Select'), ('0', 'No'), ('1', 'Yes')],
-        validators=[DataRequired(message='Stroke status is required')],
-        render_kw={'class': 'form-control'}
-    )
-    
     submit = SubmitField('Update', render_kw={'class': 'btn btn-primary'})
@@ -2,23 +2,35 @@
 Configuration module for Flask application
 Implements secure configuration with environment variables
 """
+import functools
 import os
 from datetime import timedelta
 from dotenv import load_dotenv
+from sqlalchemy.pool import StaticPool
 
-# Load environment variables from .env file
-load_dotenv()
+# Load environment variables from the .env file beside this module, if any
+_ENV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env')
+if os.path.isfile(_ENV_PATH):
+    load_dotenv(_ENV_PATH)
+
+# Fixed fallback so sessions survive restarts; never used in production
+DEV_SECRET_KEY = 'dev-only-key-do-not-use-in-prod'
 
 
 class Config:
     """Base configuration class with security-focused settings"""
     
     # Flask Core Configuration
-    SECRET_KEY = os.environ.get('SECRET_KEY') or os.urandom(32)
+    SECRET_KEY = os.environ.get('SECRET_KEY') or DEV_SECRET_KEY
     
     # SQLite Database Configuration (for user authentication)
     SQLALCHEMY_DATABASE_URI = os.environ.get('SQLALCHEMY_DATABASE_URI') or 'sqlite:///users.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    CREATE_TABLES_ON_STARTUP = True
+    
+    # Blueprints registered by create_app, by name in app.routes
+    # (a blueprint's module is only imported when it is listed here)
+    BLUEPRINTS = ('auth_bp', 'patient_bp', 'main_bp')
     
     # MongoDB Configuration (for patient records)
     MONGODB_URI = os.environ.get('MONGODB_URI') or 'mongodb://localhost:27017/'
@@ -35,17 +47,24 @@ class Config:
     PERMANENT_SESSION_LIFETIME = timedelta(minutes=30)
     
     # Password Hashing Configuration
-    BCRYPT_LOG_ROUNDS = 12
+    BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))  # used when method is 'bcrypt'
+    # Werkzeug method string (e.g. 'pbkdf2:sha256:600000', 'scrypt'), 'bcrypt' or 'argon2id'
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'pbkdf2:sha256'
+    
+    # Write last-login timestamps from a background thread
+    ASYNC_LAST_LOGIN = True
     
     # Logging Configuration
     LOG_TO_STDOUT = os.environ.get('LOG_TO_STDOUT')
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    ASYNC_SECURITY_LOG = True  # buffer security events and flush in batches
 
 
 class DevelopmentConfig(Config):
     """Development environment configuration"""
     DEBUG = True
     TESTING = False
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'pbkdf2:sha256:50000'
 
 
 class ProductionConfig(Config):
@@ -53,13 +72,24 @@ class ProductionConfig(Config):
     DEBUG = False
     TESTING = False
     SESSION_COOKIE_SECURE = True  # Require HTTPS in production
+    SECRET_KEY = os.environ.get('SECRET_KEY')  # required; checked in create_app
 
 
 class TestingConfig(Config):
     """Testing environment configuration"""
     TESTING = True
     WTF_CSRF_ENABLED = False
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///test.db'
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    # One shared connection keeps the in-memory database alive across sessions
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'connect_args': {'check_same_thread': False},
+        'poolclass': StaticPool
+    }
+    ASYNC_LAST_LOGIN = False
+    CREATE_TABLES_ON_STARTUP = False  # tests create the schema once per session
+    ASYNC_SECURITY_LOG = False
+    # Same Werkzeug pbkdf2 backend as production, at a cost cheap enough for tests
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
     MONGODB_DB_NAME = 'stroke_prediction_test'
 
 
@@ -70,3 +100,20 @@ config = {
     'testing': TestingConfig,
     'default': DevelopmentConfig
 }
+
+
+@functools.lru_cache(maxsize=None)
+def get_config(name):
+    """
+    Resolve a configuration class by environment name
+    
+    Args:
+        name (str): Configuration environment name
+        
+    Returns:
+        type: Configuration class
+        
+    Raises:
+        KeyError: If no configuration is registered under the name
+    """
+    return config[name]
@@ -2,15 +2,36 @@
 Application entry point
 Runs the Flask application
 """
-from app import create_app
 import os
 
-# Create Flask application instance
-app = create_app(os.getenv('FLASK_ENV', 'development'))
+
+def get_app():
+    """
+    Create the Flask application instance on first use
+    
+    Returns:
+        Flask: Configured Flask application instance
+    """
+    global app
+    existing = globals().get('app')
+    if existing is not None:
+        return existing
+    
+    from app import create_app
+    app = create_app(os.getenv('FLASK_ENV', 'development'))
+    return app
+
+
+def __getattr__(name):
+    """Build the application when a server such as gunicorn looks up run:app"""
+    if name == 'app':
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 if __name__ == '__main__':
     # Run development server
-    app.run(
+    get_app().run(
         host='127.0.0.1',
         port=5000,
         debug=True
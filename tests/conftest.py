@@ -4,18 +4,49 @@ Pytest configuration and fixtures
 import pytest
 import os
 import sys
+from sqlalchemy import event
 
 # Add parent directory to path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from app import create_app, db
+from app import create_app, db, login_manager
 from app.models.user import User
 
 
-@pytest.fixture(scope='module')
-def test_client():
+def _enable_sqlite_savepoints(engine):
     """
-    Create a test client for the Flask application
+    Let SQLAlchemy control transactions so SAVEPOINTs nest inside them
+    (pysqlite otherwise begins transactions lazily and breaks nesting)
+    """
+    @event.listens_for(engine, 'connect')
+    def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+    
+    @event.listens_for(engine, 'begin')
+    def _emit_begin(connection):
+        connection.exec_driver_sql('BEGIN')
+
+
+def _login_session(client, user_id):
+    """
+    Write Flask-Login's session keys into the client's session cookie
+    Skips the login form (and its password hash check) entirely
+    """
+    # The identifier must match the client's address and user agent,
+    # otherwise 'strong' session protection discards the session
+    with client.application.test_request_context(environ_base=client.environ_base):
+        identifier = login_manager._session_identifier_generator()
+    
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+        sess['_fresh'] = True
+        sess['_id'] = identifier
+
+
+@pytest.fixture(scope='session')
+def test_app():
+    """
+    Create the Flask application and database schema once per test session
     """
     # Set testing environment
     os.environ['FLASK_ENV'] = 'testing'
@@ -23,24 +54,57 @@ def test_client():
     # Create Flask app in testing mode
     flask_app = create_app('testing')
     
-    # Create a test client
-    with flask_app.test_client() as testing_client:
+    with flask_app.app_context():
+        _enable_sqlite_savepoints(db.engine)
+        db.session.configure(join_transaction_mode='create_savepoint')
+        db.create_all()
+        
+        yield flask_app
+        
+        # Clean up database
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def db_session(test_app, init_database):
+    """
+    Run a test inside an outer transaction that is rolled back afterwards
+    Commits made by the test or its requests only release a SAVEPOINT
+    """
+    # init_database is committed first so the shared in-memory connection
+    # never sees its BEGIN nested inside a test's outer transaction
+    engines = db.engines
+    engine = engines[None]
+    connection = engine.connect()
+    transaction = connection.begin()
+    engines[None] = connection
+    
+    yield db.session
+    
+    db.session.remove()
+    transaction.rollback()
+    connection.close()
+    engines[None] = engine
+
+
+@pytest.fixture
+def test_client(test_app, db_session):
+    """
+    Create a test client for the Flask application
+    The app and schema are shared; db_session rolls back each test's writes
+    """
+    with test_app.test_client() as testing_client:
         # Establish application context
-        with flask_app.app_context():
-            # Create database tables
-            db.create_all()
-            
+        with test_app.app_context():
             yield testing_client
-            
-            # Clean up database
-            db.session.remove()
-            db.drop_all()
 
 
-@pytest.fixture(scope='module')
-def init_database(test_client):
+@pytest.fixture(scope='session')
+def init_database(test_app):
     """
     Initialize database with test data
+    Seeded once per session; each test's rollback leaves the seed untouched
     """
     # Create test user
     user = User(username='testuser', email='test@example.com')
@@ -48,25 +112,30 @@ def init_database(test_client):
     
     db.session.add(user)
     db.session.commit()
+    user_id = user.id
     
-    yield
-    
-    # Cleanup
+    # Release the connection before any test opens its own transaction
     db.session.remove()
+    
+    yield user_id
+
+
+@pytest.fixture(scope='session')
+def _auth_cookie(test_app, init_database):
+    """
+    Build the test user's signed session cookie once per test session
+    """
+    client = test_app.test_client()
+    _login_session(client, init_database)
+    return client.get_cookie(test_app.config['SESSION_COOKIE_NAME'])
 
 
 @pytest.fixture(scope='function')
-def logged_in_client(test_client, init_database):
+def logged_in_client(test_client, _auth_cookie):
     """
     Create a logged-in test client
     """
-    # Log in the test user
-    test_client.post('/auth/login', data={
-        'username': 'testuser',
-        'password': 'TestPassword123'
-    }, follow_redirects=True)
+    # Reuse the cached session cookie instead of logging in again
+    test_client.set_cookie(_auth_cookie.key, _auth_cookie.value)
     
     yield test_client
-    
-    # Log out
-    test_client.get('/auth/logout', follow_redirects=True)
@@ -2,8 +2,9 @@
 Unit tests for authentication functionality
 Tests user registration, login, logout, and password security
 """
+import re
 import pytest
-from app.models.user import User
+from app.models.user import User, _login_writer
 from app import db
 
 
@@ -24,6 +25,30 @@ class TestUserModel:
         # Incorrect password should fail
         assert user.check_password('WrongPassword') == False
     
+    def test_password_hash_uses_configured_method(self, test_client):
+        """Test the Werkzeug method used in production also runs in tests"""
+        user = User(username='methodtest', email='method@test.com')
+        user.set_password('SecurePassword123')
+        assert user.password_hash.startswith('pbkdf2:sha256:1000$')
+    
+    def test_bcrypt_password_hashing(self, test_client, monkeypatch):
+        """Test the optional bcrypt backend hashes and verifies"""
+        monkeypatch.setitem(test_client.application.config, 'PASSWORD_HASH_METHOD', 'bcrypt')
+        monkeypatch.setitem(test_client.application.config, 'BCRYPT_LOG_ROUNDS', 4)
+        user = User(username='bcrypttest', email='bcrypt@test.com')
+        user.set_password('SecurePassword123')
+        
+        assert user.password_hash.startswith('$2')
+        assert user.check_password('SecurePassword123') == True
+        assert user.check_password('WrongPassword') == False
+    
+    def test_bcrypt_rejects_passwords_over_72_bytes(self, test_client, monkeypatch):
+        """Test bcrypt never silently truncates a long password"""
+        monkeypatch.setitem(test_client.application.config, 'PASSWORD_HASH_METHOD', 'bcrypt')
+        user = User(username='bcryptlong', email='bcryptlong@test.com')
+        with pytest.raises(ValueError):
+            user.set_password('Aa1' + 'x' * 70)
+    
     def test_user_creation(self, test_client):
         """Test creating a new user"""
         user = User(username='newuser', email='new@test.com')
@@ -37,6 +62,23 @@ class TestUserModel:
         assert retrieved_user is not None
         assert retrieved_user.email == 'new@test.com'
     
+    def test_async_last_login(self, test_client, init_database, monkeypatch):
+        """Test the background last-login write used outside of tests"""
+        monkeypatch.setitem(test_client.application.config, 'ASYNC_LAST_LOGIN', True)
+        user = db.session.get(User, init_database)
+        
+        user.update_last_login()
+        
+        # The in-memory value is current immediately and is not left dirty
+        assert user.last_login is not None
+        assert user.to_dict()['last_login'] == user.last_login.isoformat()
+        assert not db.session.is_modified(user)
+        
+        # The single writer thread runs jobs in order
+        _login_writer.submit(lambda: None).result(timeout=5)
+        db.session.expire(user)
+        assert db.session.get(User, init_database).last_login is not None
+    
     def test_unique_username(self, test_client, init_database):
         """Test that usernames must be unique"""
         # Try to create user with existing username
@@ -89,6 +131,19 @@ class TestRegistration:
         # Should fail validation
         assert b'Password must be' in response.data or b'at least 8 characters' in response.data
     
+    def test_registration_long_password_with_bcrypt(self, test_client, monkeypatch):
+        """Test registration rejects passwords bcrypt would truncate"""
+        monkeypatch.setitem(test_client.application.config, 'PASSWORD_HASH_METHOD', 'bcrypt')
+        password = 'Aa1' + 'x' * 70
+        response = test_client.post('/auth/register', data={
+            'username': 'longpass',
+            'email': 'long@test.com',
+            'password': password,
+            'confirm_password': password
+        }, follow_redirects=True)
+        
+        assert b'at most 72 bytes' in response.data
+    
     def test_registration_password_mismatch(self, test_client):
         """Test registration with mismatched passwords"""
         response = test_client.post('/auth/register', data={
@@ -153,6 +208,27 @@ class TestLogin:
         """Test that CSRF protection is enabled"""
         response = test_client.get('/auth/login')
         assert b'csrf_token' in response.data
+    
+    def test_csrf_token_round_trip(self, test_client, init_database, monkeypatch):
+        """Test the token rendered into the cached login form is accepted"""
+        config = test_client.application.config
+        monkeypatch.setitem(config, 'WTF_CSRF_ENABLED', True)
+        field_name = config['WTF_CSRF_FIELD_NAME']
+        credentials = {'username': 'testuser', 'password': 'TestPassword123'}
+        
+        page = test_client.get('/auth/login')
+        match = re.search(rf'name="{field_name}" value="([^"]+)"'.encode(), page.data)
+        assert match
+        
+        # Without the token the request is rejected outright
+        response = test_client.post('/auth/login', data=credentials)
+        assert response.status_code == 400
+        
+        response = test_client.post('/auth/login', data={
+            **credentials,
+            field_name: match.group(1).decode()
+        })
+        assert response.status_code == 302
 
 
 class TestLogout:
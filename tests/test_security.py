@@ -0,0 +1,145 @@
+"""
+Unit tests for security utilities
+Tests input sanitization, password policy and security event logging
+"""
+import logging
+import time
+from collections import deque
+import pytest
+from app.utils import security
+from app.utils.security import sanitize_input, validate_password_strength
+
+
+class TestSanitizeInput:
+    """Test stripping of script and iframe elements"""
+    
+    @pytest.mark.parametrize('raw,expected', [
+        pytest.param('  plain text  ', 'plain text', id='no-markup'),
+        pytest.param('a<script>alert(1)</script>b', 'ab', id='script'),
+        pytest.param('a<SCRIPT src="x">\n1\n</ScRiPt>b', 'ab', id='script-case-multiline'),
+        pytest.param('a<scriptx>b</script>c', 'ac', id='script-prefix-tag'),
+        pytest.param('a<iframe src="x"></iframe>b', 'ab', id='iframe'),
+        pytest.param('<script>1</script>x<script>2</script>', 'x', id='repeated'),
+        pytest.param('a<script>never closed', 'a<script>never closed', id='unterminated'),
+        pytest.param('1 < 2 > 0', '1 < 2 > 0', id='comparison'),
+    ])
+    def test_sanitize_input(self, raw, expected):
+        """Test elements are removed and other text is kept"""
+        assert sanitize_input(raw) == expected
+    
+    def test_non_string_passthrough(self):
+        """Test non-string values are returned unchanged"""
+        assert sanitize_input(42) == 42
+    
+    @pytest.mark.parametrize('raw', [
+        pytest.param('<script' * 200000, id='open-tags'),
+        pytest.param('<script>' * 200000, id='open-elements'),
+        pytest.param('<iframe>' * 200000 + '</script>', id='iframe-with-stray-close'),
+    ])
+    def test_unterminated_flood_is_linear(self, raw):
+        """Test long unterminated input is handled in bounded time"""
+        start = time.perf_counter()
+        assert sanitize_input(raw) == raw
+        assert time.perf_counter() - start < 0.5
+
+
+class TestCommonPasswords:
+    """Test the common password blocklist"""
+    
+    @pytest.fixture
+    def blocklist_file(self, monkeypatch):
+        """Point the blocklist loader at another file and reset its cache"""
+        def use(path):
+            monkeypatch.setattr(security, 'COMMON_PASSWORDS_FILE', str(path))
+            security._common_passwords.cache_clear()
+        
+        yield use
+        security._common_passwords.cache_clear()
+    
+    def test_shipped_file_matches_fallback(self):
+        """Test the shipped blocklist and the fallback agree"""
+        security._common_passwords.cache_clear()
+        assert security._common_passwords() == security._FALLBACK_COMMON_PASSWORDS
+    
+    def test_blocklist_loaded_from_file(self, tmp_path, blocklist_file):
+        """Test entries are read from the file, lowercased, skipping blanks"""
+        path = tmp_path / 'passwords.txt'
+        path.write_text('Tr0ubadour99\n\n  letmein  \n', encoding='utf-8')
+        blocklist_file(path)
+        
+        assert security._common_passwords() == {'tr0ubadour99', 'letmein'}
+        is_valid, message = validate_password_strength('Tr0ubadour99')
+        assert not is_valid
+        assert 'too common' in message
+    
+    def test_fallback_when_file_missing(self, tmp_path, blocklist_file):
+        """Test the built-in blocklist is used when the file cannot be read"""
+        blocklist_file(tmp_path / 'missing.txt')
+        
+        assert security._common_passwords() == security._FALLBACK_COMMON_PASSWORDS
+
+
+class TestSecurityEventBuffer:
+    """Test buffered security event logging"""
+    
+    @pytest.fixture
+    def event_buffer(self, monkeypatch):
+        """Swap in a small, empty event buffer and a stopped writer thread"""
+        buffer = deque(maxlen=3)
+        monkeypatch.setattr(security, '_event_buffer', buffer)
+        monkeypatch.setattr(security, '_dropped_events', 0)
+        monkeypatch.setattr(security, '_flusher', None)
+        return buffer
+    
+    def test_buffered_event_is_not_logged_immediately(self, test_app, event_buffer, monkeypatch, caplog):
+        """Test events are queued for the writer thread when buffering is on"""
+        started = []
+        monkeypatch.setattr(security, '_async_enabled', True)
+        monkeypatch.setattr(security, '_start_flusher', lambda: started.append(True))
+        
+        with test_app.test_request_context(), caplog.at_level(logging.WARNING, logger=security.__name__):
+            security.log_security_event('LOGIN_FAILED', details='test')
+        
+        assert started == [True]
+        assert len(event_buffer) == 1
+        assert 'LOGIN_FAILED' in event_buffer[0]
+        assert not caplog.records
+    
+    def test_flush_respects_limit(self, event_buffer, caplog):
+        """Test a flush writes at most the requested number of events"""
+        for i in range(3):
+            security._buffer_event(f'event {i}')
+        
+        with caplog.at_level(logging.WARNING, logger=security.__name__):
+            security.flush_security_events(limit=2)
+        
+        assert [r.getMessage() for r in caplog.records] == ['event 0', 'event 1']
+        assert list(event_buffer) == ['event 2']
+    
+    def test_overflow_is_counted_and_reported(self, event_buffer, caplog):
+        """Test events evicted by a full buffer are reported on the next flush"""
+        for i in range(5):
+            security._buffer_event(f'event {i}')
+        assert security._dropped_events == 2
+        
+        with caplog.at_level(logging.WARNING, logger=security.__name__):
+            security.flush_security_events()
+        
+        messages = [r.getMessage() for r in caplog.records]
+        assert '2 older events were dropped' in messages[0]
+        assert messages[1:] == ['event 2', 'event 3', 'event 4']
+        assert security._dropped_events == 0
+    
+    def test_reset_after_fork(self, event_buffer, monkeypatch):
+        """Test a forked child forgets the parent's writer thread and events"""
+        monkeypatch.setattr(security, '_flusher', object())
+        monkeypatch.setattr(security, '_flusher_lock', security._flusher_lock)
+        monkeypatch.setattr(security, '_buffer_lock', security._buffer_lock)
+        for i in range(4):
+            security._buffer_event(f'event {i}')
+        
+        security._reset_after_fork()
+        
+        assert security._flusher is None
+        assert len(event_buffer) == 0
+        assert security._dropped_events == 0